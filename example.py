@@ -21,26 +21,26 @@ def main():
     file_url = drive.upload(io.BytesIO(b"Test"), filename="some_example.txt", folder=folder)
     file_id = extract_google_id(file_url)
 
-    for file in drive.get("files").data['files']:
-        if file['id'] == file_id:
-            tempfile = io.StringIO()
-            drive.download(file_id, tempfile)
-            drive.download(file_id)
-
-            exists = os.path.exists("some_example.txt")
-            assert exists
-            if exists:
-                os.unlink("some_example.txt")
-
-            with as_binaryio(tempfile):
-                assert tempfile.read() == "Test"
-
-            endpoint = drive.endpoint("files") / file_id
-            result = drive.delete(endpoint)
-
-            assert result.success
-            assert result._response.status_code == 204  # no content, is fine
-            break
+    file = drive.get_file(file_id).data
+    assert file['id'] == file_id
+
+    tempfile = io.StringIO()
+    drive.download(file_id, tempfile)
+    drive.download(file_id)
+
+    exists = os.path.exists("some_example.txt")
+    assert exists
+    if exists:
+        os.unlink("some_example.txt")
+
+    with as_binaryio(tempfile):
+        assert tempfile.read() == "Test"
+
+    endpoint = drive.endpoint("files") / file_id
+    result = drive.delete(endpoint)
+
+    assert result.success
+    assert result._response.status_code == 204  # no content, is fine
 
 
 if __name__ == '__main__':
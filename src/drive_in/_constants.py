@@ -4,3 +4,10 @@ REDIRECT_URI = "https://oauth.trialandsuccess.nl/callback"
 SCOPE = "https://www.googleapis.com/auth/drive.file"
 
 AUTH_TOKEN_FILE = ".gdrive_access_token"  # nosec
+TOKEN_TTL = 3500  # seconds; tokens from the implicit OAuth flow are valid for an hour.
+MAX_RESUME_ATTEMPTS = 5  # how often to resume a partially received upload chunk before giving up
+
+# retry policy for failed requests (both transports): exponential backoff, or the server's Retry-After
+RETRY_ATTEMPTS = 5
+RETRY_BACKOFF_FACTOR = 0.5  # seconds; doubles every attempt
+RETRY_STATUSES = (429, 500, 502, 503, 504)
@@ -3,31 +3,67 @@ Simple API to simplify working with Google Drive.
 """
 from __future__ import annotations
 
+import functools
+import hashlib
 import json
+import logging
 import os
+import threading
+import time
 import typing
 import uuid
-import warnings
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from types import MappingProxyType
 
 import requests
-import tqdm
 from configuraptor import Singleton
 from configuraptor.helpers import as_binaryio
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from yayarl import URL
 
-from ._constants import AUTH_TOKEN_FILE, CLIENT_ID, REDIRECT_URI, SCOPE
-from .helpers import OutputManager, extract_google_id, get_size
-from .types import AnyDict, DownloadError, Result, T, UploadError
+from ._constants import (
+    AUTH_TOKEN_FILE,
+    CLIENT_ID,
+    MAX_RESUME_ATTEMPTS,
+    REDIRECT_URI,
+    RETRY_ATTEMPTS,
+    RETRY_BACKOFF_FACTOR,
+    RETRY_STATUSES,
+    SCOPE,
+    TOKEN_TTL,
+)
+from .helpers import (
+    PROGRESS_BATCH_SIZE,
+    OutputManager,
+    as_memoryview,
+    chunk_ranges,
+    extract_google_id,
+    filename_from_content_disposition,
+    get_fileno,
+    get_size,
+    is_appending,
+    iter_response,
+    json_dumps,
+    json_loads,
+    preallocate,
+    progress_bar,
+    pwrite_all,
+    retry_delay,
+    supports_pwrite,
+)
+from .types import AnyDict, ApiError, DownloadError, Result, T, UploadError
 
 try:
-    from requests.exceptions import JSONDecodeError as RequestsJSONDecodeError
+    import httpx
 except ImportError:
+    # optional, only required for `Drive(transport="httpx")` (`pip install drive-in[http2]`)
+    httpx = None  # type: ignore[assignment, unused-ignore]
 
-    class RequestsJSONDecodeError(json.JSONDecodeError):  # type: ignore
-        """
-        Fallback for older versions of `requests`.
-        """
+logger = logging.getLogger(__name__)
+
+JSON_HEADERS = {"Content-Type": "application/json; charset=UTF-8"}
 
 
 class Drive:  # pragma: no cover
@@ -37,43 +73,139 @@ class Drive:  # pragma: no cover
 
     version = "v3"
 
-    token: str
+    _token: str
+    _default_headers: typing.Mapping[str, str] = MappingProxyType({})
+    _http2_client: httpx.Client | None = None
 
     auth_url = URL("https://accounts.google.com/o/oauth2/v2/auth")
     base_url = URL("https://www.googleapis.com/drive") / version
     upload_url = URL("https://www.googleapis.com/upload/drive/") / version
 
-    def __init__(self, token: str = None, **kw: typing.Any) -> None:
+    def __init__(
+        self, token: str = None, transport: typing.Literal["requests", "httpx"] = "requests", **kw: typing.Any
+    ) -> None:
         """
         Provide an existing access_token or be prompted to create one.
+
+        With transport="httpx", the chunks of downloads and uploads are sent over a single HTTP/2 connection.
         """
+        self._session = self._create_session()
+        if transport == "httpx":
+            self._http2_client = self._create_http2_client()
+
         self.token = token or self.authenticate(**kw)
-        self.ping()
 
-    def generate_headers(self) -> dict[str, str]:
+    @property
+    def token(self) -> str:
         """
-        After .authenticate(), create default auth header.
+        The current access token.
         """
-        return {
-            "Authorization": f"Bearer {self.token}",  # Replace with your access token
-            "Content-Type": "application/json; charset=UTF-8",
-        }
+        return self._token
+
+    @token.setter
+    def token(self, token: str) -> None:
+        """
+        Store a new access token and update the default headers of the session with it.
+        """
+        self._token = token
+        # note: no Content-Type here, since chunk uploads send file bytes rather than JSON.
+        self._default_headers = MappingProxyType({"Authorization": f"Bearer {token}"})
+        self._session.headers.update(self._default_headers)
+        if self._http2_client is not None:
+            self._http2_client.headers.update(self._default_headers)
+
+    @staticmethod
+    def _create_session() -> requests.Session:
+        """
+        Set up a pooled session so subsequent requests to Google can reuse their TCP/TLS connection.
+        """
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=10,
+            pool_maxsize=20,
+            max_retries=Retry(
+                total=RETRY_ATTEMPTS,
+                backoff_factor=RETRY_BACKOFF_FACTOR,
+                status_forcelist=RETRY_STATUSES,
+                allowed_methods=["GET", "PUT", "POST", "PATCH", "DELETE"],
+                respect_retry_after_header=True,
+                # after the last attempt, return the failed response (-> Result.success = False) instead of raising:
+                raise_on_status=False,
+            ),
+        )
+        session.mount("https://", adapter)
+        return session
+
+    @staticmethod
+    def _create_http2_client() -> httpx.Client:
+        """
+        Set up an HTTP/2 client, which multiplexes concurrent chunk requests over one connection.
+        """
+        if httpx is None:
+            raise ImportError("The httpx transport requires additional dependencies: `pip install drive-in[http2]`")
+
+        transport = httpx.HTTPTransport(
+            http2=True,
+            limits=httpx.Limits(max_keepalive_connections=4, max_connections=8),
+            retries=RETRY_ATTEMPTS,  # only covers connection errors, statuses are retried in `_chunk_request`
+        )
+        return httpx.Client(transport=transport)
+
+    def close(self) -> None:
+        """
+        Close the underlying HTTP session (and its connection pool).
+        """
+        self._session.close()
+        if self._http2_client is not None:
+            self._http2_client.close()
+
+    def __enter__(self) -> Drive:
+        """
+        Allow using Drive as a context manager: `with Drive() as drive: ...`.
+        """
+        return self
+
+    def __exit__(self, *_: typing.Any) -> None:
+        """
+        Close the session when leaving the context manager.
+        """
+        self.close()
+
+    def generate_headers(self) -> typing.Mapping[str, str]:
+        """
+        After .authenticate(), get the (read-only) default auth headers.
+        """
+        return self._default_headers
+
+    def _merge_headers(self, session: requests.Session | None, headers: dict[str, str] | None) -> dict[str, str] | None:
+        """
+        The Drive session already sends the default headers, so only foreign sessions need them explicitly.
+        """
+        if session is None or session is self._session:
+            return headers
+
+        return {**self._default_headers, **(headers or {})}
 
     def endpoint(self, resource: str) -> URL:
         """
         Return an URL object to a specific resource.
         """
         # https://developers.google.com/drive/api/reference/rest/v3
-        return self.base_url / resource
+        return self._endpoint_cached(resource)
+
+    @classmethod
+    @functools.lru_cache(maxsize=128)
+    def _endpoint_cached(cls, resource: str) -> URL:
+        # URL objects are immutable, so the same one can safely be reused for common resources ("about", "files")
+        return cls.base_url / resource
 
     def _handle_resp(self, resp: requests.Response, url: URL | None = None) -> Result:
         if resp.status_code > 399:
-            warnings.warn(f"Response to {url} failed with status code {resp.status_code}")
+            logger.warning("Response to %s failed with status code %d", url, resp.status_code)
 
         try:
-            data = resp.json()
-            data = typing.cast(AnyDict, data)
-        except (json.JSONDecodeError, RequestsJSONDecodeError):
+            data = typing.cast(AnyDict, json_loads(resp.content))
+        except ValueError:  # both json.JSONDecodeError and orjson.JSONDecodeError
             data = {}
 
         return Result(
@@ -83,13 +215,10 @@ class Drive:  # pragma: no cover
             _response=resp,
         )
 
-    def _build_url(self, resource: str | URL, session: requests.Session | None) -> URL:
+    def _build_url(self, resource: str | URL, query: AnyDict = None) -> URL:
         url = self.endpoint(resource) if isinstance(resource, str) else resource
-
-        if session:
-            url &= session
-
-        return url
+        # note: the session is passed per request rather than bound with `&`, which would copy (and re-parse) the URL.
+        return url % query if query else url
 
     def get(
         self, resource: str | URL, data: AnyDict = None, session: requests.Session = None, **kwargs: typing.Any
@@ -99,13 +228,12 @@ class Drive:  # pragma: no cover
 
         Supports everything from `requests.get`.
         """
-        url = self._build_url(resource, session)
-        url %= data or {}
+        url = self._build_url(resource, data)
 
-        headers = self.generate_headers() | kwargs.pop("headers", {})
+        headers = self._merge_headers(session, kwargs.pop("headers", None))
         timeout = kwargs.pop("timeout", 5)
 
-        resp = url.get(headers=headers, timeout=timeout, **kwargs)
+        resp = url.get(session or self._session, headers=headers, timeout=timeout, **kwargs)
 
         return self._handle_resp(resp, url)
 
@@ -117,12 +245,12 @@ class Drive:  # pragma: no cover
 
         Supports everything from `requests.post`.
         """
-        url = self._build_url(resource, session)
+        url = self._build_url(resource)
 
-        headers = self.generate_headers() | kwargs.pop("headers", {})
+        headers = self._merge_headers(session, JSON_HEADERS | kwargs.pop("headers", {}))
         timeout = kwargs.pop("timeout", 5)
 
-        resp = url.post(headers=headers, json=data, timeout=timeout, **kwargs)
+        resp = url.post(session or self._session, headers=headers, json=data, timeout=timeout, **kwargs)
 
         return self._handle_resp(resp, url)
 
@@ -134,12 +262,12 @@ class Drive:  # pragma: no cover
 
         Supports everything from `requests.patch`.
         """
-        url = self._build_url(resource, session)
+        url = self._build_url(resource)
 
-        headers = self.generate_headers() | kwargs.pop("headers", {})
+        headers = self._merge_headers(session, JSON_HEADERS | kwargs.pop("headers", {}))
         timeout = kwargs.pop("timeout", 5)
 
-        resp = url.patch(headers=headers, json=data, timeout=timeout, **kwargs)
+        resp = url.patch(session or self._session, headers=headers, json=data, timeout=timeout, **kwargs)
 
         return self._handle_resp(resp, url)
 
@@ -151,16 +279,53 @@ class Drive:  # pragma: no cover
 
         Supports everything from `requests.delete`.
         """
-        url = self._build_url(resource, session)
-        url %= data or {}
+        url = self._build_url(resource, data)
 
-        headers = self.generate_headers() | kwargs.pop("headers", {})
+        headers = self._merge_headers(session, kwargs.pop("headers", None))
         timeout = kwargs.pop("timeout", 5)
 
-        resp = url.delete(headers=headers, timeout=timeout, **kwargs)
+        resp = url.delete(session or self._session, headers=headers, timeout=timeout, **kwargs)
 
         return self._handle_resp(resp, url)
 
+    def get_file(self, file_id: str, fields: str = "id,name,mimeType", **kwargs: typing.Any) -> Result:
+        """
+        GET the metadata of a single file.
+
+        file_id can be an ID or a full URL to the file.
+        `fields` selects which metadata properties are returned.
+        """
+        return self.get(f"files/{extract_google_id(file_id)}", {"fields": fields}, **kwargs)
+
+    def list_files(self, query: str = None, fields: str = "files(id,name,md5Checksum)") -> typing.Iterator[AnyDict]:
+        """
+        Iterate over all files (optionally matching a search query), fetching as few pages as possible.
+
+        Only the requested `fields` are returned, which keeps the responses small.
+        Raises an ApiError if a page can not be fetched.
+
+        Example:
+            for file in drive.list_files("name contains 'report'", fields="files(id,name)"):
+                print(file["name"])
+        """
+        # https://developers.google.com/drive/api/guides/search-files
+        params: AnyDict = {"pageSize": 1000, "fields": f"nextPageToken,{fields}"}
+        if query:
+            params["q"] = query
+
+        while True:
+            result = self.get("files", params)
+            if not result.success:
+                # otherwise, e.g. an expired token would look like an empty listing:
+                raise ApiError(result._response.status_code, result._response.text)
+
+            yield from result.data.get("files", [])
+
+            if not (page_token := result.data.get("nextPageToken")):
+                return
+
+            params["pageToken"] = page_token
+
     def ping(self, session: requests.Session = None) -> bool:
         """
         Make sure the authentication token works and the API responds normally.
@@ -169,30 +334,46 @@ class Drive:  # pragma: no cover
 
         return result.success and result.data.get("kind") == "drive#about"
 
-    def _load_token(self) -> str:
+    def _load_token(self) -> AnyDict:
         with open(AUTH_TOKEN_FILE, "r") as f:
-            return f.read()
+            content = f.read()
+
+        try:
+            return typing.cast(AnyDict, json.loads(content))
+        except json.JSONDecodeError:
+            # legacy cache file: only contains the token itself
+            return {"token": content}
 
-    def _store_token(self, token: str) -> None:
+    def _store_token(self, token: str, scope: str = SCOPE) -> None:
         with open(AUTH_TOKEN_FILE, "w") as f:
-            f.write(token)
+            json.dump({"token": token, "expires_at": time.time() + TOKEN_TTL, "scope": scope}, f)
 
     def _remove_token(self) -> None:
         if os.path.exists(AUTH_TOKEN_FILE):
             os.unlink(AUTH_TOKEN_FILE)
 
-    def authenticate_cached(self) -> str | None:
+    def authenticate_cached(self, scope: str = SCOPE) -> str | None:
         """
         Load a previous token from a file on disk.
 
-        If the file fails, remove it.
+        If the token is known to be valid for at least another minute, it is used without checking with the API.
+        If the file fails (or the token expired), remove it.
         """
         try:
-            self.token = self._load_token()
-            if self.ping():  # could crash if invalid auth, should do normal authenticate() in that case.
+            cached = self._load_token()
+            if cached.get("scope", scope) != scope:
+                raise ValueError("scope changed")
+
+            self.token = cached["token"]
+            expires_at = cached.get("expires_at")
+
+            # unknown expiry: ask the API. Could crash if invalid auth, should do normal authenticate() in that case.
+            valid = self.ping() if expires_at is None else expires_at - time.time() > 60
+
+            if valid:
                 return self.token
             else:
-                raise ValueError("ping failed")
+                raise ValueError("token expired")
         except Exception:
             self._remove_token()
             return None
@@ -207,7 +388,7 @@ class Drive:  # pragma: no cover
          Other methods that do not require a callback, expect a private key or secure config which is not
          feasible for an open source library.
         """
-        if cache and (token := self.authenticate_cached()):
+        if cache and (token := self.authenticate_cached(scope)):
             return token
 
         # Construct the URL
@@ -226,7 +407,7 @@ class Drive:  # pragma: no cover
         token = input("Please paste your token here: ")
 
         if cache:
-            self._store_token(token)
+            self._store_token(token, scope)
 
         return token
 
@@ -236,6 +417,7 @@ class Drive:  # pragma: no cover
         to_file: str | Path | typing.IO[T] | None = None,
         chunks_size_mb: int = 25,
         overwrite: bool = True,
+        max_workers: int = 4,
     ) -> typing.IO[T]:
         """
         Download a file in multiple chunks.
@@ -244,6 +426,7 @@ class Drive:  # pragma: no cover
         the name from the metadata will be used.
 
         file_id can be an ID or a full URL to the file.
+        Up to `max_workers` chunks are downloaded concurrently (if the output file is seekable).
 
         Examples:
              drive.download("<some id>", "output.txt")
@@ -265,22 +448,23 @@ class Drive:  # pragma: no cover
         file_id = extract_google_id(file_id)
         url = self.base_url / "files" / file_id
 
-        with requests.Session() as session:
-            # bytesio, stringio
-            # bytesio, bytesio
-            # bufferedwriter, bufferedwriter
-            # bytesio, textiowrapper
-            url &= session
-            metadata = self.get(url)
-
-            if not metadata.success:
-                raise DownloadError(
-                    status_code=metadata._response.status_code,
-                    message=metadata._response.text,
-                )
+        media_url = url % {"alt": "media"}
+
+        # bytesio, stringio
+        # bytesio, bytesio
+        # bufferedwriter, bufferedwriter
+        # bytesio, textiowrapper
 
+        # the first chunk doubles as the existence check, so no separate metadata request is needed:
+        first_chunk = self._download_range(media_url, 0, chunks_size_mb * 1024 * 1024 - 1)
+
+        try:
             if to_file is None:
-                filepath = Path(metadata.data["name"])
+                # only fall back to a metadata request if the response doesn't mention the filename:
+                filename = filename_from_content_disposition(first_chunk.headers.get("Content-Disposition", ""))
+                filename = filename or self.get_file(file_id, fields="name").data["name"]
+                # the name comes from a remote source, so never let it point outside the current directory:
+                filepath = Path(Path(filename).name)
                 if filepath.exists() and not overwrite:
                     raise ValueError(
                         f"File {filepath} already exists. "
@@ -290,8 +474,59 @@ class Drive:  # pragma: no cover
                 to_file = filepath
 
             with OutputManager(to_file) as (temp_file, output):
-                self._download_chunks(url % {"alt": "media"}, chunks_size_mb, temp_file)
+                self._download_chunks(media_url, chunks_size_mb, temp_file, max_workers=max_workers, first=first_chunk)
                 return output
+        finally:
+            # (already closed if the download went through, but not if something failed before that)
+            first_chunk.close()
+
+    def _chunk_request(
+        self,
+        method: str,
+        url: str,
+        headers: dict[str, str],
+        body: memoryview = None,
+        timeout: int = 60,
+        stream: bool = False,
+    ) -> requests.Response | httpx.Response:
+        """
+        Send a request for a single chunk of a download or upload, over HTTP/2 if the httpx transport is used.
+
+        With stream=True, only the headers are read; the body can be consumed later with `iter_response`.
+        Note: the httpx transport has to copy the body of uploaded chunks.
+        """
+        if self._http2_client is not None:
+            # httpx would iterate a memoryview byte by byte, so it needs real bytes:
+            content = None if body is None else bytes(body)
+            request = self._http2_client.build_request(method, url, headers=headers, content=content, timeout=timeout)
+
+            # same retry policy as the requests session (see `_create_session`):
+            for attempt in range(RETRY_ATTEMPTS + 1):
+                response = self._http2_client.send(request, stream=stream)
+                if response.status_code not in RETRY_STATUSES or attempt == RETRY_ATTEMPTS:
+                    break
+
+                response.close()
+                time.sleep(retry_delay(response.headers.get("Retry-After"), attempt, RETRY_BACKOFF_FACTOR))
+
+            return response
+
+        # (requests' stubs don't mention buffers, but any bytes-like object works)
+        data = typing.cast(bytes | None, body)
+        return self._session.request(method, url, headers=headers, data=data, timeout=timeout, stream=stream)
+
+    def _download_range(self, url: URL | str, start: int, end: int) -> requests.Response | httpx.Response:
+        """
+        Request a byte range of a file, without reading the response body yet.
+        """
+        resp = self._chunk_request("GET", str(url), headers={"Range": f"bytes={start}-{end}"}, stream=True)
+        if resp.status_code > 399:
+            raise DownloadError(
+                status_code=resp.status_code,
+                message=b"".join(iter_response(resp)).decode(errors="replace"),
+            )
+
+        return resp
 
     def _download_chunks(
         self,
@@ -299,34 +534,91 @@ class Drive:  # pragma: no cover
         chunks_size_mb: int,
         tempfile: typing.BinaryIO,
         total_content_length: int = None,
+        max_workers: int = 4,
+        first: requests.Response | httpx.Response | None = None,
     ) -> None:
         chunk_size = chunks_size_mb * 1024 * 1024
-        start = 0
-        current_content_length = 0
-        with tqdm.tqdm(total=total_content_length or 0, unit="B", unit_scale=True, unit_divisor=1024) as progress:
-            while True:
-                end = start + chunk_size - 1
-
-                result = self.get(url, headers={"Range": f"bytes={start}-{end}"})
-                byterange: str = result._response.headers["Content-Range"].split("-")[-1]
-
-                len_info = byterange.split("/")
-                start = int(len_info[0]) + 1
-
-                if not total_content_length:
-                    total_content_length = int(len_info[1])
-                    progress.reset(total_content_length)
-
-                content = result._response.content
-                tempfile.write(content)
+        # serialize the URL once instead of for every chunk:
+        media_url = str(url)
+        # chunks are written at their own offset, which requires a seekable target.
+        # Otherwise, fall back to a single worker so the chunks arrive in order.
+        # In append mode, every write ends up at the end of the file regardless of the position, so it's treated
+        # like a non-seekable target too.
+        seekable = tempfile.seekable() and not is_appending(tempfile)
+        offset = tempfile.tell() if seekable else 0
+        # regular files skip Python's buffered io and are written to directly (and concurrently) with pwrite:
+        fd = get_fileno(tempfile) if seekable else None
+        if fd is not None and not supports_pwrite(fd):
+            fd = None
+        lock = threading.Lock()
+
+        with progress_bar(total_content_length or 0) as progress:
+
+            def write(start: int, resp: requests.Response | httpx.Response) -> int:
+                # the body is streamed in small blocks and written while the rest is still being received:
+                position = offset + start
+                pending = 0  # bytes written but not yet reported to the progress bar
+                for block in iter_response(resp):
+                    if fd is not None:
+                        pwrite_all(fd, block, position)
+                    else:
+                        with lock:
+                            if seekable:
+                                tempfile.seek(position)
+                            tempfile.write(block)
+
+                    position += len(block)
+                    pending += len(block)
+                    if pending >= PROGRESS_BATCH_SIZE:
+                        # (tqdm's counter isn't thread-safe)
+                        with lock:
+                            progress.update(pending)
+                        pending = 0
+
+                with lock:
+                    progress.update(pending)
+                return position - offset - start
+
+            def fetch(byterange: tuple[int, int]) -> int:
+                return write(byterange[0], self._download_range(media_url, *byterange))
+
+            # the first chunk also tells us the total size, after which the rest can be requested in parallel:
+            if first is None:
+                first = self._download_range(media_url, 0, chunk_size - 1)
+
+            # without Content-Range (200 instead of 206), the server ignored the range and sent the whole file:
+            content_range = first.headers.get("Content-Range")
+            whole_file = content_range is None
+
+            if not total_content_length:
+                total_content_length = int(
+                    content_range.split("/")[-1] if content_range else first.headers.get("Content-Length", 0)
+                )
+                progress.reset(total_content_length)
 
-                current_content_length += len(content)
-                progress.update(len(content))
+            if fd is not None and total_content_length:
+                # anything still in Python's buffer must land before writing to the fd directly:
+                tempfile.flush()
+                preallocate(fd, offset + total_content_length)
 
-                if current_content_length < total_content_length:
-                    continue
-                else:
-                    break
+            if whole_file:
+                # nothing left to request (and the Content-Length may have been missing):
+                total_content_length = write(0, first)
+            else:
+                with ThreadPoolExecutor(max_workers=max_workers if seekable else 1) as executor:
+                    # the first chunk is written by a worker too, so the other ranges don't have to wait for it.
+                    # (with a single worker, the jobs still run in the order they were submitted)
+                    jobs = [executor.submit(write, 0, first)]
+                    jobs += [
+                        executor.submit(fetch, byterange)
+                        for byterange in chunk_ranges(total_content_length, chunk_size, start=chunk_size)
+                    ]
+                    # consume the results so exceptions in the workers are raised here:
+                    for job in jobs:
+                        job.result()
+
+            if seekable:
+                tempfile.seek(offset + total_content_length)
 
     def upload(
         self,
@@ -334,11 +626,14 @@ class Drive:  # pragma: no cover
         filename: str = None,
         folder: str = None,
         chunks_size_mb: int = 25,
+        deduplicate: bool = False,
     ) -> str:
         """
         Upload a file in multiple chunks.
 
         file_path can be either a path to a file, or an in-memory file-like object (bytesio).
+        With `deduplicate`, nothing is uploaded if a file with the same name and contents (MD5 checksum)
+         already exists in the folder. The url of that existing file is returned instead.
 
         Returns the new file url.
         """
@@ -348,16 +643,36 @@ class Drive:  # pragma: no cover
         if not filename and isinstance(file_path, str):
             filename = os.path.basename(file_path)
 
-        with requests.Session() as session, as_binaryio(file_path) as file_obj:
+        filename = filename or "model.vst"
+
+        session = self._session
+        with as_binaryio(file_path) as file_obj, as_memoryview(file_obj) as buffer:
+            if deduplicate:
+                checksum = hashlib.md5(buffer, usedforsecurity=False).hexdigest()
+                if existing_id := self._find_existing(filename, folder, checksum):
+                    return f"https://drive.google.com/file/d/{existing_id}/view"
+
             location = self._initialize_upload(filename, folder, session)
 
             total_size = os.path.getsize(file_path) if isinstance(file_path, str) else get_size(file_obj)
-            self._upload_chunks(file_obj, total_size, location, session, chunks_size_mb)
+            self._upload_chunks(buffer, total_size, location, chunks_size_mb)
 
             metadata = self._finalize_upload(location, session)
 
         return f"https://drive.google.com/file/d/{metadata['id']}/view"
 
+    def _find_existing(self, filename: str, folder: str | None, checksum: str) -> str | None:
+        """
+        Find the ID of a (non-trashed) file with the same name, folder and MD5 checksum, if any.
+        """
+        # https://developers.google.com/drive/api/guides/search-files
+        name = filename.replace("\\", "\\\\").replace("'", "\\'")
+        # without a folder, the upload would end up in the root of the drive, so only look there:
+        query = f"name = '{name}' and trashed = false and '{folder or 'root'}' in parents"
+
+        files = self.list_files(query, fields="files(id,md5Checksum)")
+        return next((file["id"] for file in files if file.get("md5Checksum") == checksum), None)
+
     def _initialize_upload(self, filename: str | None, folder: str | None, session: requests.Session) -> str:
         metadata: dict[str, str | list[str]] = {
             "name": filename or "model.vst",
@@ -372,35 +687,75 @@ class Drive:  # pragma: no cover
                     "uploadType": "resumable",
                 }
             ),
-            headers=self.generate_headers(),
-            json=metadata,
+            headers=JSON_HEADERS,
+            data=json_dumps(metadata),
             timeout=10,
         )
         return resp.headers["Location"]
 
-    def _upload_chunks(
-        self, file: typing.BinaryIO, total_size: int, location: str, session: requests.Session, chunks_size_mb: int
-    ) -> None:
+    def _upload_chunks(self, buffer: memoryview, total_size: int, location: str, chunks_size_mb: int) -> None:
         chunk_size = chunks_size_mb * 1024 * 1024  # 50MB chunk size (you can adjust this)
-        with tqdm.tqdm(total=total_size, unit="B", unit_scale=True, unit_divisor=1024) as progress:
-            start_byte = 0
-            while start_byte < total_size:
-                end_byte = start_byte + chunk_size - 1
-                if end_byte >= total_size:
-                    end_byte = total_size - 1
-
-                headers = {
+        # the chunks of a file with a known size are known up front, so prepare their headers before uploading:
+        chunks = [
+            (
+                start_byte,
+                end_byte,
+                {
                     "Content-Length": str(end_byte - start_byte + 1),
                     "Content-Range": f"bytes {start_byte}-{end_byte}/{total_size}",
-                }
+                },
+            )
+            for start_byte, end_byte in chunk_ranges(total_size, chunk_size)
+        ]
+
+        with progress_bar(total_size) as progress:
+            for start_byte, end_byte, headers in chunks:
+                received = self._put_chunk(location, buffer, start_byte, end_byte, headers)
+                # the server may report less than before (e.g. a 308 without Range), the bar never goes back:
+                progress.update(max(received - progress.n, 0))
+
+                attempts = 0
+                while received <= end_byte:
+                    # the server only stored part of this chunk, resume from where it stopped instead of restarting:
+                    if attempts >= MAX_RESUME_ATTEMPTS:
+                        raise UploadError(308, f"Upload stalled at byte {received} of {total_size}")
+
+                    resume_headers = {
+                        "Content-Length": str(end_byte - received + 1),
+                        "Content-Range": f"bytes {received}-{end_byte}/{total_size}",
+                    }
+                    previous, received = received, self._put_chunk(location, buffer, received, end_byte, resume_headers)
+                    progress.update(max(received - progress.n, 0))
+                    # only give up if the server repeatedly doesn't store anything new:
+                    attempts = 0 if received > previous else attempts + 1
+
+    def _put_chunk(
+        self, location: str, buffer: memoryview, start_byte: int, end_byte: int, headers: dict[str, str]
+    ) -> int:
+        """
+        Upload the bytes start_byte-end_byte (inclusive) of the buffer.
+
+        Returns up to which byte the server has received the file (exclusive).
+        """
+        # slicing a memoryview doesn't copy, so the chunk goes straight from the (mapped) file to the socket.
+        # (os.sendfile can't do better here: uploads always use TLS, which has to encrypt in user space,
+        #  and ssl sockets fall back to plain send() for sendfile anyway.)
+        # the slice is released right away; otherwise a traceback holding on to it prevents closing the mmap.
+        with buffer[start_byte : end_byte + 1] as chunk:
+            response = self._chunk_request("PUT", location, headers=headers, body=chunk)
+
+        if response.status_code > 399:
+            raise UploadError(response.status_code, response.text)
 
-                response = session.put(location, headers=headers, data=file.read(chunk_size), timeout=60)
+        if response.status_code != 308:
+            # 200/201: the upload is complete
+            return end_byte + 1
 
-                if response.status_code > 399:
-                    raise UploadError(response.status_code, response.text)
+        # 308 Resume Incomplete: the Range header ("bytes=0-X") says what the server has persisted so far
+        if not (received_range := response.headers.get("Range")):
+            return 0
 
-                progress.update(end_byte - start_byte + 1)
-                start_byte = end_byte + 1
+        return int(received_range.split("-")[-1]) + 1
 
     def _finalize_upload(self, location: str, session: requests.Session) -> dict[str, str]:
         # Step 3: Finalize the upload with a 200 status code
@@ -408,7 +763,7 @@ class Drive:  # pragma: no cover
         response = session.put(location, headers=headers, timeout=5)
         if response.status_code != 200:
             raise UploadError(response.status_code, response.text)
-        metadata = response.json()
+        metadata = json_loads(response.content)
         return typing.cast(dict[str, str], metadata)
 
 
@@ -1,22 +1,133 @@
 """
 Reusable helpers.
 """
-
+import codecs
+import contextlib
+import email.message
+import functools
 import io
+import json
+import mmap
 import os
 import re
+import stat
 import types
 import typing
-from pathlib import Path
+from pathlib import Path, PosixPath, WindowsPath
+
+import tqdm
+
+try:
+    import orjson
+except ImportError:
+    # optional, a faster drop-in for json (`pip install drive-in[speedups]`)
+    orjson = None  # type: ignore[assignment, unused-ignore]
 
 GOOGLE_ID_RE = re.compile(r"[-\w]{25,}")
+DECODE_BLOCK_SIZE = 64 * 1024
+STREAM_BLOCK_SIZE = 1024 * 1024
+PROGRESS_BATCH_SIZE = 8 * 1024 * 1024
 
 
+@functools.lru_cache(maxsize=1024)
 def extract_google_id(url: str) -> str:
     """
     From a Google Drive File URL, extract the unique file ID.
     """
-    return next(GOOGLE_ID_RE.finditer(url)).group(0) or ""
+    if "/" not in url and GOOGLE_ID_RE.fullmatch(url):
+        # already a bare ID
+        return url
+
+    match = GOOGLE_ID_RE.search(url)
+    return match.group(0) if match else ""
+
+
+def filename_from_content_disposition(header: str) -> str | None:
+    """
+    Extract the filename from a Content-Disposition header, if any.
+
+    Examples:
+        - 'attachment; filename="example.txt"'
+        - "attachment; filename*=UTF-8''ex%C3%A4mple.txt"
+    """
+    if not header:
+        return None
+
+    message = email.message.Message()
+    message["Content-Disposition"] = header
+    return message.get_filename()
+
+
+def json_loads(content: bytes) -> typing.Any:
+    """
+    Parse JSON with orjson if it is installed, or the stdlib json module otherwise.
+
+    Raises a ValueError on invalid JSON in both cases.
+    """
+    if orjson is not None:
+        return orjson.loads(content)
+
+    return json.loads(content)
+
+
+def json_dumps(data: typing.Any) -> bytes:
+    """
+    Serialize data to (UTF-8 encoded) JSON with orjson if it is installed, or the stdlib json module otherwise.
+    """
+    if orjson is not None:
+        serialized: bytes = orjson.dumps(data)
+        return serialized
+
+    return json.dumps(data).encode()
+
+
+def chunk_ranges(total_size: int, chunk_size: int, start: int = 0) -> list[tuple[int, int]]:
+    """
+    Split `total_size` bytes (from `start`) into inclusive (start, end) byte ranges of at most `chunk_size` bytes.
+
+    Example:
+        chunk_ranges(10, 4) -> [(0, 3), (4, 7), (8, 9)]
+    """
+    return [(offset, min(offset + chunk_size, total_size) - 1) for offset in range(start, total_size, chunk_size)]
+
+
+def progress_bar(total: int) -> "tqdm.tqdm[typing.Any]":
+    """
+    Create a progress bar for a transfer of `total` bytes.
+
+    The bar only redraws every quarter second or 16 MiB, to keep the overhead of frequent updates low.
+    """
+    return tqdm.tqdm(
+        total=total,
+        unit="B",
+        unit_scale=True,
+        unit_divisor=1024,
+        mininterval=0.25,
+        miniters=16 * 1024 * 1024,
+    )
+
+
+def retry_delay(retry_after: str | None, attempt: int, backoff_factor: float = 0.5) -> float:
+    """
+    How long to wait before retrying: the server's Retry-After (in seconds) if given, exponential backoff otherwise.
+
+    Examples:
+        retry_delay("3", 0) -> 3.0
+        retry_delay(None, 2) -> 2.0
+    """
+    if retry_after and retry_after.isdigit():
+        return float(retry_after)
+
+    return float(backoff_factor * 2**attempt)
+
+
+def iter_response(resp: typing.Any, block_size: int = STREAM_BLOCK_SIZE) -> typing.Iterator[bytes]:
+    """
+    Stream the body of a (requests or httpx) response in blocks, and close the response afterwards.
+    """
+    blocks = resp.iter_bytes(block_size) if hasattr(resp, "iter_bytes") else resp.iter_content(block_size)
+    with contextlib.closing(resp):
+        yield from blocks
 
 
 def get_size(file_obj: io.BytesIO | io.BufferedReader | typing.BinaryIO) -> int:
@@ -34,6 +145,167 @@ def get_size(file_obj: io.BytesIO | io.BufferedReader | typing.BinaryIO) -> int:
         return os.fstat(file_obj.fileno()).st_size
 
 
+def get_fileno(file_obj: typing.IO[typing.Any]) -> int | None:
+    """
+    Get the file descriptor of a real file, or None for in-memory files (e.g. io.BytesIO).
+    """
+    try:
+        return file_obj.fileno()
+    except (AttributeError, OSError):  # io.UnsupportedOperation is an OSError
+        return None
+
+
+def is_appending(file_obj: typing.IO[typing.Any]) -> bool:
+    """
+    Whether the file was opened in append mode, in which case every write ends up at the end of the file.
+    """
+    mode = getattr(file_obj, "mode", "")
+    return isinstance(mode, str) and "a" in mode
+
+
+def supports_pwrite(fd: int) -> bool:
+    """
+    Whether chunks can be written to the file descriptor at their own offset with os.pwrite.
+
+    Only regular files qualify; devices (e.g. /dev/null) and pipes can't be preallocated.
+    """
+    return hasattr(os, "pwrite") and stat.S_ISREG(os.fstat(fd).st_mode)
+
+
+def preallocate(fd: int, size: int) -> None:
+    """
+    Reserve `size` bytes for a file up front, to prevent fragmentation while writing it out of order.
+
+    This is only an optimization, so it silently does nothing if the file can't be preallocated.
+    """
+    try:
+        os.posix_fallocate(fd, 0, size)
+    except (AttributeError, OSError):
+        # not available on this platform or not supported by this filesystem
+        with contextlib.suppress(OSError):
+            os.ftruncate(fd, size)
+
+
+def pwrite_all(fd: int, data: bytes, offset: int) -> None:
+    """
+    Write all of `data` to the file descriptor at `offset`, without touching its position.
+
+    Unlike file.write, os.pwrite may write only part of the data, so keep going until everything is written.
+    """
+    view = memoryview(data)
+    while view:
+        written = os.pwrite(fd, view, offset)
+        view = view[written:]
+        offset += written
+
+
+@contextlib.contextmanager
+def as_memoryview(file_obj: io.BytesIO | io.BufferedReader | typing.BinaryIO) -> typing.Iterator[memoryview]:
+    """
+    Expose the contents of a file object as a (read-only) memoryview, so slices of it can be sent without copying.
+
+    File Examples:
+        - io.BytesIO(): uses the underlying buffer
+        - open("myfile", "rb"): memory-maps the file
+    """
+    if isinstance(file_obj, io.BytesIO):
+        with file_obj.getbuffer() as view:
+            yield view
+    elif hasattr(file_obj, "fileno") and get_size(file_obj):
+        with mmap.mmap(file_obj.fileno(), 0, access=mmap.ACCESS_READ) as mm, memoryview(mm) as view:
+            yield view
+    else:
+        # empty files can't be mmapped, other file-likes don't have a buffer to share.
+        with memoryview(file_obj.read()) as view:
+            yield view
+
+
+H = typing.TypeVar("H")
+EnterHandler = typing.Callable[[typing.Any], tuple[typing.BinaryIO, typing.IO[typing.Any]]]
+ExitHandler = typing.Callable[[typing.BinaryIO, typing.IO[typing.Any]], None]
+
+
+def _dispatch(handlers: dict[type, H], obj: typing.Any, default: H) -> H:
+    """
+    Look up the handler for the type of obj.
+
+    The exact type is tried first (a single dict lookup), subclasses fall back to isinstance in the table's order.
+    """
+    if (handler := handlers.get(type(obj))) is not None:
+        return handler
+
+    return next((handler for cls, handler in handlers.items() if isinstance(obj, cls)), default)
+
+
+def _new_buffer(_: None) -> tuple[typing.BinaryIO, typing.IO[typing.Any]]:
+    buffer = io.BytesIO()
+    return buffer, buffer
+
+
+def _open_path(path: str | Path) -> tuple[typing.BinaryIO, typing.IO[typing.Any]]:
+    file = Path(path).open("wb")  # noqa: SIM115
+    return file, file
+
+
+def _text_sink(sink: typing.TextIO) -> tuple[typing.BinaryIO, typing.IO[typing.Any]]:
+    # download into a binary buffer first, decode into the text sink at the end:
+    return io.BytesIO(), sink
+
+
+def _binary_sink(sink: typing.BinaryIO) -> tuple[typing.BinaryIO, typing.IO[typing.Any]]:
+    return sink, sink
+
+
+def _rewind(_: typing.BinaryIO, output: typing.IO[typing.Any]) -> None:
+    output.seek(0)
+
+
+def _decode_into(to_file: typing.BinaryIO, output: typing.IO[typing.Any]) -> None:
+    to_file.seek(0)
+    # decode in blocks so memory usage doesn't grow with the size of the file:
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    while block := to_file.read(DECODE_BLOCK_SIZE):
+        output.write(decoder.decode(block))
+    output.write(decoder.decode(b"", final=True))
+    output.seek(0)
+
+
+def _decode_into_and_close(to_file: typing.BinaryIO, output: typing.IO[typing.Any]) -> None:
+    _decode_into(to_file, output)
+    output.close()
+
+
+def _noop(*_: typing.Any) -> None:
+    return None
+
+
+# type of `to_file` -> (binary file to write to, output to return)
+ENTER_HANDLERS: dict[type, EnterHandler] = {
+    type(None): _new_buffer,
+    str: _open_path,
+    Path: _open_path,
+    # Path() actually creates one of these:
+    PosixPath: _open_path,
+    WindowsPath: _open_path,
+    io.BytesIO: _binary_sink,
+    io.BufferedWriter: _binary_sink,
+    io.BufferedRandom: _binary_sink,
+    io.StringIO: _text_sink,
+    io.TextIOWrapper: _text_sink,
+    io.TextIOBase: _text_sink,
+}
+
+# type of `output` -> cleanup
+EXIT_HANDLERS: dict[type, ExitHandler] = {
+    io.BytesIO: _rewind,
+    io.BufferedWriter: _noop,
+    io.BufferedRandom: _noop,
+    io.StringIO: _decode_into,
+    io.TextIOWrapper: _decode_into_and_close,
+    io.TextIOBase: _decode_into,
+}
+
+
 class OutputManager:
     """
     Context manager that deals with multiple (pseudo) file objects.
@@ -52,19 +324,11 @@ class OutputManager:
         """
         When starting the ctx manager.
         """
-        if self.to_file is None:
-            self.output = self.to_file = io.BytesIO()
-        elif isinstance(self.to_file, str):
-            self.output = self.to_file = Path(self.to_file).open("wb")  # noqa: SIM115
-        elif isinstance(self.to_file, Path):
-            self.output = self.to_file = self.to_file.open("wb")
-        elif isinstance(self.to_file, (io.StringIO, io.TextIOBase)):
-            self.output = self.to_file
-            self.to_file = io.BytesIO()
-        else:
-            self.output = self.to_file
-
-        return typing.cast(typing.BinaryIO, self.to_file), self.output
+        handler: EnterHandler = _dispatch(ENTER_HANDLERS, self.to_file, _binary_sink)
+        to_file, self.output = handler(self.to_file)
+        self.to_file = to_file
+
+        return to_file, self.output
 
     def __exit__(
         self, exc_type: typing.Type[BaseException], exc_value: BaseException, traceback: types.TracebackType | None
@@ -72,15 +336,7 @@ class OutputManager:
         """
         Executes on success and error.
         """
-        if isinstance(self.output, io.BytesIO):
-            self.output.seek(0)
-        elif isinstance(self.output, (io.StringIO, io.TextIOBase)):
-            self.to_file.seek(0)
-            content = self.to_file.read().decode()
-            self.output.write(content)
-            self.output.seek(0)
-
-        if isinstance(self.output, io.TextIOWrapper):
-            self.output.close()
+        handler: ExitHandler = _dispatch(EXIT_HANDLERS, self.output, _noop)
+        handler(typing.cast(typing.BinaryIO, self.to_file), typing.cast(typing.IO[typing.Any], self.output))
 
         return False  # Propagate any exceptions
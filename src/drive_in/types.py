@@ -17,7 +17,7 @@ class BaseDriveInException(Exception):
     """
 
 
-@dataclass
+@dataclass(slots=True)
 class UploadError(BaseDriveInException):
     """
     Raised when something goes wrong while uploading to Drive.
@@ -27,7 +27,7 @@ class UploadError(BaseDriveInException):
     message: str
 
 
-@dataclass
+@dataclass(slots=True)
 class DownloadError(BaseDriveInException):
     """
     Raised when something goes wrong while uploading to Drive.
@@ -37,7 +37,17 @@ class DownloadError(BaseDriveInException):
     message: str
 
 
-@dataclass
+@dataclass(slots=True)
+class ApiError(BaseDriveInException):
+    """
+    Raised when a Drive API request fails where no Result can be returned (e.g. while listing files).
+    """
+
+    status_code: int
+    message: str
+
+
+@dataclass(slots=True)
 class Result:
     """
     Container for API request responses.
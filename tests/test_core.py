@@ -0,0 +1,447 @@
+import hashlib
+import io
+import itertools
+import json
+import os
+import threading
+import time
+import typing
+from pathlib import Path
+from unittest import mock
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+import requests
+
+import drive_in.core
+from drive_in._constants import RETRY_ATTEMPTS, SCOPE, TOKEN_TTL
+from drive_in.core import Drive
+from drive_in.helpers import chunk_ranges
+from drive_in.types import ApiError, UploadError
+
+
+def make_response(status_code: int, headers: dict[str, str] = None, body: bytes = b"") -> requests.Response:
+    resp = requests.Response()
+    resp.status_code = status_code
+    resp.headers.update(headers or {})
+    resp.raw = io.BytesIO(body)
+    return resp
+
+
+class ProgressRecorder:
+    """
+    Stand-in for the tqdm progress bar that remembers every update.
+    """
+
+    def __init__(self, total: int) -> None:
+        self.total = total
+        self.n = 0
+        self.updates: list[int] = []
+
+    def __enter__(self) -> "ProgressRecorder":
+        return self
+
+    def __exit__(self, *_: typing.Any) -> None:
+        return None
+
+    def update(self, n: int) -> None:
+        self.updates.append(n)
+        self.n += n
+
+    def reset(self, total: int) -> None:
+        self.total = total
+
+
+@pytest.fixture
+def drive() -> typing.Iterator[Drive]:
+    # with a token, no requests are made on construction:
+    with Drive(token="test") as drive:
+        yield drive
+
+
+@pytest.fixture
+def progress(monkeypatch: pytest.MonkeyPatch) -> list[ProgressRecorder]:
+    bars: list[ProgressRecorder] = []
+
+    def progress_bar(total: int) -> ProgressRecorder:
+        bars.append(ProgressRecorder(total))
+        return bars[-1]
+
+    monkeypatch.setattr(drive_in.core, "progress_bar", progress_bar)
+    return bars
+
+
+def test_api_requests_use_session(drive: Drive):
+    # common endpoints are memoized:
+    assert drive.endpoint("about") is drive.endpoint("about")
+
+    response = make_response(200, body=b'{"kind": "drive#about"}')
+    with mock.patch.object(drive._session, "get", return_value=response) as get:
+        result = drive.get("about", {"fields": "kind"})
+
+    assert result.success
+    assert result.data == {"kind": "drive#about"}
+    get.assert_called_once_with("https://www.googleapis.com/drive/v3/about?fields=kind", headers=None, timeout=5)
+
+    # other sessions need the default headers explicitly:
+    other = requests.Session()
+    with mock.patch.object(other, "post", return_value=make_response(200, body=b"{}")) as post:
+        drive.post("files", {"name": "x"}, session=other)
+
+    assert post.call_args.kwargs["headers"]["Authorization"] == "Bearer test"
+    assert post.call_args.kwargs["json"] == {"name": "x"}
+
+
+@pytest.fixture
+def token_file(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> Path:
+    path = tmp_path / ".gdrive_access_token"
+    monkeypatch.setattr(drive_in.core, "AUTH_TOKEN_FILE", str(path))
+    return path
+
+
+def test_token_cache(drive: Drive, token_file: Path):
+    drive._store_token("cached", SCOPE)
+
+    cached = json.loads(token_file.read_text())
+    assert cached["token"] == "cached"
+    assert cached["scope"] == SCOPE
+    assert cached["expires_at"] == pytest.approx(time.time() + TOKEN_TTL, abs=5)
+
+    # a known expiry is trusted without asking the API:
+    with mock.patch.object(drive, "ping") as ping:
+        assert drive.authenticate_cached(SCOPE) == "cached"
+
+    ping.assert_not_called()
+    assert drive.token == "cached"
+
+
+@pytest.mark.parametrize("remaining, valid", [(3600, True), (120, True), (30, False), (-10, False)])
+def test_token_cache_expiry(drive: Drive, token_file: Path, remaining: int, valid: bool):
+    # tokens that expire within a minute aren't used anymore:
+    token_file.write_text(json.dumps({"token": "cached", "expires_at": time.time() + remaining, "scope": SCOPE}))
+
+    assert drive.authenticate_cached(SCOPE) == ("cached" if valid else None)
+    assert token_file.exists() == valid
+
+
+def test_token_cache_scope_changed(drive: Drive, token_file: Path):
+    token_file.write_text(json.dumps({"token": "cached", "expires_at": time.time() + 3600, "scope": "other"}))
+
+    assert drive.authenticate_cached(SCOPE) is None
+    assert not token_file.exists()
+
+
+@pytest.mark.parametrize("valid", [True, False])
+def test_token_cache_legacy(drive: Drive, token_file: Path, valid: bool):
+    # older versions only stored the token itself, without expiry, so the API has to be asked:
+    token_file.write_text("legacy")
+
+    with mock.patch.object(drive, "ping", return_value=valid) as ping:
+        assert drive.authenticate_cached(SCOPE) == ("legacy" if valid else None)
+
+    ping.assert_called_once()
+    assert token_file.exists() == valid
+
+
+def test_authenticate_stores_token(drive: Drive, token_file: Path, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr("builtins.input", lambda _: "pasted")
+
+    with mock.patch("builtins.print"):
+        assert drive.authenticate() == "pasted"
+
+    assert json.loads(token_file.read_text())["token"] == "pasted"
+
+    # the next time, the cached token is used instead of prompting:
+    monkeypatch.setattr("builtins.input", mock.Mock(side_effect=AssertionError("prompted")))
+    assert drive.authenticate() == "pasted"
+
+
+def download_in_ranges(drive: Drive, data: bytes, output: typing.BinaryIO, chunk_size: int = 500) -> mock.Mock:
+    """
+    Download `data` into `output` in chunks of `chunk_size` bytes, from a server that supports Range requests.
+    """
+
+    def respond(*_: typing.Any, headers: dict[str, str], **__: typing.Any) -> requests.Response:
+        start, end = map(int, headers["Range"].removeprefix("bytes=").split("-"))
+        end = min(end, len(data) - 1)
+        return make_response(206, {"Content-Range": f"bytes {start}-{end}/{len(data)}"}, data[start : end + 1])
+
+    ranges = chunk_ranges(len(data), chunk_size, start=chunk_size)
+    with (
+        mock.patch.object(drive_in.core, "chunk_ranges", return_value=ranges),
+        mock.patch.object(drive, "_chunk_request", side_effect=respond) as request,
+    ):
+        first = drive._download_range("https://media", 0, chunk_size - 1)
+        drive._download_chunks(drive.base_url, 1, output, first=first)
+
+    return request
+
+
+def test_download_ranges(drive: Drive, progress: list[ProgressRecorder]):
+    data = bytes(range(256)) * 5  # 1280 bytes
+
+    output = io.BytesIO()
+    request = download_in_ranges(drive, data, output)
+
+    assert request.call_count == 3
+    assert output.getvalue() == data
+    assert progress[0].n == len(data)
+
+
+@pytest.mark.usefixtures("progress")
+def test_download_ranges_to_file(drive: Drive, tmp_path: Path):
+    data = bytes(range(256)) * 50 + b"tail"
+    path = tmp_path / "download.bin"
+
+    with path.open("wb") as f:
+        download_in_ranges(drive, data, f)
+        assert f.tell() == len(data)
+
+    assert path.read_bytes() == data
+
+
+@pytest.mark.usefixtures("progress")
+def test_download_ranges_to_file_with_offset(drive: Drive, tmp_path: Path):
+    data = bytes(range(256)) * 50 + b"tail"
+    path = tmp_path / "download.bin"
+
+    with path.open("wb") as f:
+        # buffered, not yet flushed to the file:
+        f.write(b"header")
+        download_in_ranges(drive, data, f)
+        f.write(b"footer")
+
+    assert path.read_bytes() == b"header" + data + b"footer"
+
+
+@pytest.mark.usefixtures("progress")
+def test_download_ranges_to_appended_file(drive: Drive, tmp_path: Path):
+    # in append mode, pwrite ignores the offset, so the chunks have to be written in order instead:
+    data = bytes(range(256)) * 50 + b"tail"
+    path = tmp_path / "download.bin"
+    path.write_bytes(b"existing")
+
+    with path.open("ab") as f:
+        download_in_ranges(drive, data, f)
+
+    assert path.read_bytes() == b"existing" + data
+
+
+def test_download_ranges_to_device(drive: Drive, progress: list[ProgressRecorder]):
+    # character devices can't be preallocated (or truncated):
+    with open(os.devnull, "wb") as f:
+        download_in_ranges(drive, bytes(range(256)) * 50, f)
+
+    assert progress[0].n == 256 * 50
+
+
+def test_download_first_chunk_concurrently(drive: Drive, progress: list[ProgressRecorder]):
+    data = b"0123456789" * 100
+    second_requested = threading.Event()
+
+    class FirstBody(io.BytesIO):
+        def read(self, size: int = -1) -> bytes:
+            # only finishes if the second range is requested while the first chunk is still being written:
+            assert second_requested.wait(timeout=5)
+            return super().read(size)
+
+    def respond(*_: typing.Any, **__: typing.Any) -> requests.Response:
+        second_requested.set()
+        return make_response(206, {"Content-Range": f"bytes 500-999/{len(data)}"}, data[500:])
+
+    first = make_response(206, {"Content-Range": f"bytes 0-499/{len(data)}"})
+    first.raw = FirstBody(data[:500])
+
+    output = io.BytesIO()
+    with (
+        mock.patch.object(drive_in.core, "chunk_ranges", return_value=[(500, 999)]),
+        mock.patch.object(drive, "_chunk_request", side_effect=respond),
+    ):
+        drive._download_chunks(drive.base_url, 1, output, first=first)
+
+    assert output.getvalue() == data
+    assert progress[0].n == len(data)
+
+
+@pytest.mark.parametrize("seekable", [True, False])
+def test_download_range_ignored(drive: Drive, progress: list[ProgressRecorder], seekable: bool):
+    # some servers ignore the Range header and respond with 200 and the whole file:
+    data = b"0123456789" * 100
+
+    class Sink(io.BytesIO):
+        def seekable(self) -> bool:
+            return seekable
+
+    output = Sink()
+    with mock.patch.object(
+        drive, "_chunk_request", return_value=make_response(200, {"Content-Length": str(len(data))}, data)
+    ) as request:
+        drive._download_chunks(drive.base_url, 1, output)
+
+    assert request.call_count == 1
+    assert output.getvalue() == data
+    assert progress[0].total == len(data)
+    assert progress[0].n == len(data)
+
+
+def test_upload_error_path(drive: Drive, tmp_path: Path):
+    # the mapped file and chunk views must be released, so the UploadError isn't replaced by a BufferError:
+    file = tmp_path / "upload.bin"
+    file.write_bytes(b"x" * 1024)
+
+    with (
+        mock.patch.object(drive, "_initialize_upload", return_value="https://upload"),
+        mock.patch.object(drive, "_chunk_request", return_value=make_response(500, body=b"oops")),
+        pytest.raises(UploadError) as exc,
+    ):
+        drive.upload(file)
+
+    assert exc.value.status_code == 500
+
+
+def test_retry_config(drive: Drive):
+    retry = drive._session.get_adapter("https://www.googleapis.com").max_retries
+    assert retry.total == RETRY_ATTEMPTS
+    assert "PUT" in retry.allowed_methods
+    assert 503 in retry.status_forcelist
+    assert not retry.raise_on_status
+
+
+@pytest.mark.parametrize(
+    "response, expected",
+    [
+        (make_response(200), 10),
+        (make_response(201), 10),
+        (make_response(308, {"Range": "bytes=0-9"}), 10),
+        (make_response(308, {"Range": "bytes=0-4"}), 5),
+        # nothing persisted yet:
+        (make_response(308), 0),
+    ],
+)
+def test_put_chunk(drive: Drive, response: requests.Response, expected: int):
+    bodies = []
+
+    def respond(*_: typing.Any, body: memoryview, **__: typing.Any) -> requests.Response:
+        # (the chunk view is released after the request)
+        bodies.append(bytes(body))
+        return response
+
+    with mock.patch.object(drive, "_chunk_request", side_effect=respond):
+        assert drive._put_chunk("https://upload", memoryview(b"0123456789"), 2, 9, {}) == expected
+
+    assert bodies == [b"23456789"]
+
+
+def test_put_chunk_error(drive: Drive):
+    with (
+        mock.patch.object(drive, "_chunk_request", return_value=make_response(403, body=b"forbidden")),
+        pytest.raises(UploadError) as exc,
+    ):
+        drive._put_chunk("https://upload", memoryview(b"0123456789"), 0, 9, {})
+
+    assert exc.value.status_code == 403
+
+
+def test_upload_chunks_resume(drive: Drive, progress: list[ProgressRecorder]):
+    buffer = memoryview(b"0123456789")
+    responses = [
+        make_response(308, {"Range": "bytes=0-5"}),
+        # e.g. after a reset, the server reports having nothing:
+        make_response(308),
+        make_response(308, {"Range": "bytes=0-7"}),
+        make_response(200),
+    ]
+
+    with (
+        mock.patch.object(drive, "_chunk_request", side_effect=responses) as request,
+        mock.patch.object(drive_in.core, "chunk_ranges", return_value=[(0, 9)]),
+    ):
+        drive._upload_chunks(buffer, 10, "https://upload", 1)
+
+    ranges = [call.kwargs["headers"]["Content-Range"] for call in request.call_args_list]
+    assert ranges == ["bytes 0-9/10", "bytes 6-9/10", "bytes 0-9/10", "bytes 8-9/10"]
+
+    (bar,) = progress
+    assert all(update >= 0 for update in bar.updates)
+    assert bar.n == 10
+
+
+def test_upload_chunks_stalled(drive: Drive, progress: list[ProgressRecorder]):
+    with (
+        mock.patch.object(drive, "_chunk_request", side_effect=lambda *_, **__: make_response(308)),
+        pytest.raises(UploadError),
+    ):
+        drive._upload_chunks(memoryview(b"0123456789"), 10, "https://upload", 1)
+
+    assert progress[0].updates == [0] * len(progress[0].updates)
+
+
+@pytest.mark.parametrize(
+    "filename, folder, expected",
+    [
+        ("report.txt", None, "name = 'report.txt' and trashed = false and 'root' in parents"),
+        ("report.txt", "folder-id", "name = 'report.txt' and trashed = false and 'folder-id' in parents"),
+        ("it's a \\ test", None, "name = 'it\\'s a \\\\ test' and trashed = false and 'root' in parents"),
+    ],
+)
+def test_find_existing(drive: Drive, filename: str, folder: str | None, expected: str):
+    files = [{"id": "other", "md5Checksum": "abc"}, {"id": "match", "md5Checksum": "def"}]
+    with mock.patch.object(drive, "list_files", return_value=iter(files)) as list_files:
+        assert drive._find_existing(filename, folder, "def") == "match"
+
+    assert list_files.call_args.args[0] == expected
+
+    with mock.patch.object(drive, "list_files", return_value=iter(files)):
+        assert drive._find_existing(filename, folder, "xyz") is None
+
+
+def test_upload_deduplicate(drive: Drive):
+    data = b"same contents"
+    checksum = hashlib.md5(data, usedforsecurity=False).hexdigest()
+
+    with (
+        mock.patch.object(drive, "list_files", return_value=iter([{"id": "existing", "md5Checksum": checksum}])),
+        mock.patch.object(drive, "_initialize_upload") as initialize,
+    ):
+        url = drive.upload(io.BytesIO(data), "file.txt", deduplicate=True)
+
+    assert url == "https://drive.google.com/file/d/existing/view"
+    initialize.assert_not_called()
+
+    # different contents: uploaded anyway
+    with (
+        mock.patch.object(drive, "list_files", return_value=iter([{"id": "existing", "md5Checksum": "other"}])),
+        mock.patch.object(drive, "_initialize_upload", side_effect=UploadError(500, "stop here")) as initialize,
+        pytest.raises(UploadError),
+    ):
+        drive.upload(io.BytesIO(data), "file.txt", deduplicate=True)
+
+    initialize.assert_called_once()
+
+
+def test_list_files(drive: Drive):
+    pages = [
+        make_response(200, body=b'{"files": [{"id": "1"}, {"id": "2"}], "nextPageToken": "page-2"}'),
+        make_response(200, body=b'{"files": [{"id": "3"}], "nextPageToken": "page-3"}'),
+        make_response(401, body=b'{"error": {"message": "Invalid Credentials"}}'),
+    ]
+
+    with mock.patch.object(drive._session, "get", side_effect=pages) as get:
+        files = drive.list_files("name contains 'report'", fields="files(id)")
+
+        assert [file["id"] for file in itertools.islice(files, 3)] == ["1", "2", "3"]
+        with pytest.raises(ApiError) as exc:
+            next(files)
+
+    assert exc.value.status_code == 401
+    assert "Invalid Credentials" in exc.value.message
+
+    queries = [parse_qs(urlsplit(call.args[0]).query) for call in get.call_args_list]
+    assert queries[0] == {"pageSize": ["1000"], "fields": ["nextPageToken,files(id)"], "q": ["name contains 'report'"]}
+    assert queries[1]["pageToken"] == ["page-2"]
+    assert queries[2]["pageToken"] == ["page-3"]
+
+
+def test_list_files_last_page(drive: Drive):
+    with mock.patch.object(drive._session, "get", return_value=make_response(200, body=b'{"files": [{"id": "1"}]}')):
+        assert list(drive.list_files()) == [{"id": "1"}]
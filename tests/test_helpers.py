@@ -0,0 +1,197 @@
+import io
+import os
+import typing
+from pathlib import Path
+
+import pytest
+
+from drive_in import helpers
+from drive_in.helpers import (
+    ENTER_HANDLERS,
+    EXIT_HANDLERS,
+    OutputManager,
+    _binary_sink,
+    _decode_into,
+    _decode_into_and_close,
+    _dispatch,
+    _new_buffer,
+    _noop,
+    _open_path,
+    _rewind,
+    _text_sink,
+    chunk_ranges,
+    extract_google_id,
+    filename_from_content_disposition,
+    is_appending,
+    preallocate,
+    retry_delay,
+    supports_pwrite,
+)
+
+
+def test_extract_google_id():
+    file_id = "1a2B3c4D5e6F7g8H9i0J-k_LmNoPq"
+    assert extract_google_id(file_id) == file_id
+    assert extract_google_id(f"https://drive.google.com/file/d/{file_id}/view") == file_id
+    assert extract_google_id("https://drive.google.com/") == ""
+
+
+def test_decode_text_output(monkeypatch: pytest.MonkeyPatch):
+    # tiny blocks so the multibyte characters are split across reads:
+    monkeypatch.setattr(helpers, "DECODE_BLOCK_SIZE", 3)
+    text = "ä€𝄞 plain ascii ✓" * 5
+
+    with OutputManager(io.StringIO()) as (to_file, output):
+        to_file.write(text.encode())
+
+    assert output.read() == text
+
+
+def test_chunk_ranges():
+    assert chunk_ranges(10, 4) == [(0, 3), (4, 7), (8, 9)]
+    assert chunk_ranges(8, 4) == [(0, 3), (4, 7)]
+    assert chunk_ranges(3, 4) == [(0, 2)]
+    assert chunk_ranges(0, 4) == []
+    assert chunk_ranges(10, 4, start=4) == [(4, 7), (8, 9)]
+    assert chunk_ranges(10, 4, start=10) == []
+
+
+def test_filename_from_content_disposition():
+    assert filename_from_content_disposition('attachment; filename="example.txt"') == "example.txt"
+    assert filename_from_content_disposition("attachment; filename=example.txt") == "example.txt"
+    assert filename_from_content_disposition("attachment; filename*=UTF-8''ex%C3%A4mple.txt") == "exämple.txt"
+    assert filename_from_content_disposition("attachment") is None
+    assert filename_from_content_disposition("") is None
+
+
+def test_retry_delay():
+    assert retry_delay("3", 0) == 3.0
+    assert retry_delay(None, 0) == 0.5
+    assert retry_delay(None, 2) == 2.0
+    # HTTP-dates aren't supported, so backoff is used instead:
+    assert retry_delay("Wed, 21 Oct 2015 07:28:00 GMT", 1, backoff_factor=1) == 2.0
+
+
+def test_decode_into(monkeypatch: pytest.MonkeyPatch):
+    # tiny blocks so the multibyte characters are split across reads:
+    monkeypatch.setattr(helpers, "DECODE_BLOCK_SIZE", 3)
+    text = "ä€𝄞 plain ascii ✓" * 5
+
+    output = io.StringIO()
+    _decode_into(io.BytesIO(text.encode()), output)
+    assert output.tell() == 0
+    assert output.read() == text
+
+    output = io.StringIO()
+    _decode_into_and_close(io.BytesIO(text.encode()), output)
+    assert output.closed
+
+
+def _old_enter(to_file: typing.Any) -> typing.Any:
+    # the isinstance ladder the dispatch table replaced:
+    if to_file is None:
+        return _new_buffer
+    elif isinstance(to_file, (str, Path)):
+        return _open_path
+    elif isinstance(to_file, (io.StringIO, io.TextIOWrapper, io.TextIOBase)):
+        return _text_sink
+    else:
+        return _binary_sink
+
+
+def _old_exit(output: typing.Any) -> typing.Any:
+    if isinstance(output, io.BytesIO):
+        return _rewind
+    elif isinstance(output, io.TextIOWrapper):
+        return _decode_into_and_close
+    elif isinstance(output, (io.StringIO, io.TextIOBase)):
+        return _decode_into
+    else:
+        return _noop
+
+
+class MyBytesIO(io.BytesIO):
+    pass
+
+
+class MyStringIO(io.StringIO):
+    pass
+
+
+def test_dispatch_equivalence(tmp_path: Path):
+    with (
+        open(tmp_path / "wb", "wb") as buffered_writer,
+        open(tmp_path / "rb+", "wb+") as buffered_random,
+        open(tmp_path / "w", "w") as text_wrapper,
+    ):
+        objects = [
+            None,
+            "file.txt",
+            Path("file.txt"),
+            io.BytesIO(),
+            MyBytesIO(),
+            io.StringIO(),
+            MyStringIO(),
+            buffered_writer,
+            buffered_random,
+            text_wrapper,
+        ]
+
+        for obj in objects:
+            assert _dispatch(ENTER_HANDLERS, obj, _binary_sink) is _old_enter(obj), obj
+            assert _dispatch(EXIT_HANDLERS, obj, _noop) is _old_exit(obj), obj
+
+
+def test_output_manager(tmp_path: Path):
+    with OutputManager(None) as (to_file, output):
+        to_file.write(b"data")
+    assert to_file is output
+    assert output.read() == b"data"
+
+    with OutputManager(io.StringIO()) as (to_file, output):
+        to_file.write("ä".encode())
+    assert output.read() == "ä"
+
+    path = tmp_path / "out.bin"
+    with OutputManager(path) as (to_file, output):
+        to_file.write(b"data")
+    # the opened file is returned to the caller (as before), so it's still open:
+    assert not output.closed
+    output.close()
+    assert path.read_bytes() == b"data"
+
+    with open(tmp_path / "out.txt", "w") as f:
+        with OutputManager(f) as (to_file, output):
+            to_file.write(b"text")
+        assert f.closed
+    assert (tmp_path / "out.txt").read_text() == "text"
+
+
+def test_is_appending(tmp_path: Path):
+    path = tmp_path / "file.bin"
+    for mode, appending in [("wb", False), ("ab", True), ("a+b", True), ("r+b", False)]:
+        with path.open(mode) as f:
+            assert is_appending(f) == appending, mode
+
+    assert not is_appending(io.BytesIO())
+
+
+def test_supports_pwrite(tmp_path: Path):
+    with (tmp_path / "file.bin").open("wb") as f:
+        assert supports_pwrite(f.fileno())
+
+    read_fd, write_fd = os.pipe()
+    try:
+        assert not supports_pwrite(write_fd)
+        # neither fallocate nor ftruncate work on a pipe, which shouldn't be fatal:
+        preallocate(write_fd, 1024)
+    finally:
+        os.close(read_fd)
+        os.close(write_fd)
+
+
+def test_preallocate(tmp_path: Path):
+    with (tmp_path / "file.bin").open("wb") as f:
+        preallocate(f.fileno(), 1024)
+
+    assert (tmp_path / "file.bin").stat().st_size == 1024